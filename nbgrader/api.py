@@ -3,6 +3,7 @@ from __future__ import division
 from . import utils
 
 import contextlib
+import os
 
 from sqlalchemy import (create_engine, ForeignKey, Column, String, Text,
     DateTime, Interval, Float, Enum, UniqueConstraint, Boolean)
@@ -11,6 +12,8 @@ from sqlalchemy.orm.exc import NoResultFound, FlushError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import NullPool
 from sqlalchemy.sql import and_
 from sqlalchemy import select, func, exists, case, literal_column
 
@@ -1009,6 +1012,40 @@ SubmittedAssignment.late_submission_penalty = column_property(
         .correlate_except(SubmittedNotebook), deferred=True)
 
 
+#: Engines that are shared by all gradebooks connecting to the same database
+#: from the same process, keyed by ``(pid, db_url)``
+_engines = {}
+
+
+def _get_engine(db_url):
+    """Get the engine for the database at `db_url`, and whether it is shared
+    with other gradebooks (in which case it should not be disposed of when a
+    gradebook is closed).
+
+    """
+    url = make_url(db_url)
+
+    # every connection to an in-memory database is a new database, so these
+    # can't be shared
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return create_engine(db_url), False
+
+    # the process id is part of the key so that processes which are forked
+    # off (e.g. when autograding in parallel) don't reuse the connections
+    # belonging to their parent
+    key = (os.getpid(), db_url)
+    if key not in _engines:
+        if url.get_backend_name() == 'sqlite':
+            # don't hold sqlite database files open in between gradebooks
+            _engines[key] = create_engine(db_url, poolclass=NullPool)
+        else:
+            _engines[key] = create_engine(
+                db_url, pool_size=5, max_overflow=10,
+                pool_pre_ping=True, pool_recycle=1800)
+
+    return _engines[key], True
+
+
 class Gradebook(object):
     """The gradebook object to interface with the database holding
     nbgrader grades.
@@ -1024,8 +1061,9 @@ class Gradebook(object):
             The URL to the database, e.g. ``sqlite:///grades.db``
 
         """
-        # create the connection to the database
-        self.engine = create_engine(db_url)
+        # create the connection to the database, reusing the engine (and its
+        # connection pool) from any other gradebook for the same database
+        self.engine, self._shared_engine = _get_engine(db_url)
         self.db = scoped_session(sessionmaker(autoflush=True, bind=self.engine))
 
         # this creates all the tables in the database if they don't already exist
@@ -1047,7 +1085,8 @@ class Gradebook(object):
 
         """
         self.db.remove()
-        self.engine.dispose()
+        if not self._shared_engine:
+            self.engine.dispose()
 
     #### Students
 
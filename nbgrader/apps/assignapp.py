@@ -148,11 +148,11 @@ class AssignApp(BaseNbConvertApp):
         ComputeChecksums,
         SaveCells,
         ClearHiddenTests,
-        ComputeChecksums,
         CheckCellMetadata,
     ])
     # NB: ClearHiddenTests must come after ComputeChecksums and SaveCells.
-    # ComputerChecksums must come again after ClearHiddenTests.
+    # ClearHiddenTests updates the checksums of the cells it modifies, so
+    # ComputeChecksums does not need to run again afterwards.
 
     def build_extra_config(self):
         extra_config = super(AssignApp, self).build_extra_config()
@@ -160,40 +160,56 @@ class AssignApp(BaseNbConvertApp):
         extra_config.CourseDirectory.notebook_id = '*'
         return extra_config
 
-    def _clean_old_notebooks(self, assignment_id, student_id):
-        with Gradebook(self.coursedir.db_url) as gb:
-            assignment = gb.find_assignment(assignment_id)
-            regexp = re.escape(os.path.sep).join([
-                self._format_source("(?P<assignment_id>.*)", "(?P<student_id>.*)", escape=True),
-                "(?P<notebook_id>.*).ipynb"
-            ])
-
-            # find a set of notebook ids for new notebooks
-            new_notebook_ids = set([])
-            for notebook in self.notebooks:
-                m = re.match(regexp, notebook)
-                if m is None:
-                    raise RuntimeError("Could not match '%s' with regexp '%s'", notebook, regexp)
-                gd = m.groupdict()
-                if gd['assignment_id'] == assignment_id and gd['student_id'] == student_id:
-                    new_notebook_ids.add(gd['notebook_id'])
-
-            # pull out the existing notebook ids
-            old_notebook_ids = set(x.name for x in assignment.notebooks)
-
-            # no added or removed notebooks, so nothing to do
-            if old_notebook_ids == new_notebook_ids:
-                return
-
-            # some notebooks have been removed, but there are submissions associated
-            # with the assignment, so we don't want to overwrite stuff
-            if len(assignment.submissions) > 0:
-                self.fail("Cannot modify existing assignment '%s' because there are submissions associated with it", assignment)
-
-            # remove the old notebooks
-            for notebook_id in (old_notebook_ids - new_notebook_ids):
-                self.log.warning("Removing notebook '%s' from the gradebook", notebook_id)
-                gb.remove_notebook(notebook_id, assignment_id)
+    def _iter_new_notebook_ids(self, assignment_id, student_id):
+        """Yields the ids of the notebooks being converted that belong to
+        the given assignment and student."""
+        source = os.path.normpath(self._format_source(assignment_id, student_id))
+        pattern = None
+
+        for notebook in self.notebooks:
+            # notebooks that are directly inside the source directory of this
+            # assignment are identified just by their filename
+            dirname, filename = os.path.split(os.path.normpath(notebook))
+            if dirname == source and filename.endswith(".ipynb"):
+                yield filename[:-len(".ipynb")]
+                continue
+
+            # otherwise, fall back to parsing the ids out of the full path
+            if pattern is None:
+                regexp = re.escape(os.path.sep).join([
+                    self._format_source("(?P<assignment_id>.*)", "(?P<student_id>.*)", escape=True),
+                    "(?P<notebook_id>.*).ipynb"
+                ])
+                pattern = re.compile(regexp + r"\Z")
+
+            m = pattern.match(notebook)
+            if m is None:
+                raise RuntimeError("Could not match '%s' with regexp '%s'", notebook, pattern.pattern)
+            gd = m.groupdict()
+            if gd['assignment_id'] == assignment_id and gd['student_id'] == student_id:
+                yield gd['notebook_id']
+
+    def _clean_old_notebooks(self, gb, assignment, assignment_id, student_id):
+        """Removes notebooks from the database that are no longer part of
+        the assignment, using the already open gradebook `gb` and the
+        corresponding `assignment` object."""
+        # find the ids of the new and the existing notebooks
+        new_notebook_ids = frozenset(self._iter_new_notebook_ids(assignment_id, student_id))
+        old_notebook_ids = frozenset(x.name for x in assignment.notebooks)
+
+        # no added or removed notebooks, so nothing to do
+        if old_notebook_ids == new_notebook_ids:
+            return
+
+        # some notebooks have been removed, but there are submissions associated
+        # with the assignment, so we don't want to overwrite stuff
+        if len(assignment.submissions) > 0:
+            self.fail("Cannot modify existing assignment '%s' because there are submissions associated with it", assignment)
+
+        # remove the old notebooks
+        for notebook_id in (old_notebook_ids - new_notebook_ids):
+            self.log.warning("Removing notebook '%s' from the gradebook", notebook_id)
+            gb.remove_notebook(notebook_id, assignment_id)
 
     def init_assignment(self, assignment_id, student_id):
         super(AssignApp, self).init_assignment(assignment_id, student_id)
@@ -201,27 +217,24 @@ class AssignApp(BaseNbConvertApp):
         # try to get the assignment from the database, and throw an error if it
         # doesn't exist
         if not self.no_database:
-            assignment = {}
-            for a in self.db_assignments:
-                if a['name'] == assignment_id:
-                    assignment = a.copy()
-                    break
-
-            if assignment or self.create_assignment:
-                if 'name' in assignment:
-                    del assignment['name']
-                self.log.info("Updating/creating assignment '%s': %s", assignment_id, assignment)
-                with Gradebook(self.coursedir.db_url) as gb:
-                    gb.update_or_create_assignment(assignment_id, **assignment)
-
-            else:
-                with Gradebook(self.coursedir.db_url) as gb:
+            assignment = self._db_assignments_by_name.get(assignment_id, {}).copy()
+
+            # use a single connection to the database both for checking the
+            # assignment and for cleaning up old notebooks
+            with Gradebook(self.coursedir.db_url) as gb:
+                if assignment or self.create_assignment:
+                    if 'name' in assignment:
+                        del assignment['name']
+                    self.log.info("Updating/creating assignment '%s': %s", assignment_id, assignment)
+                    assignment_row = gb.update_or_create_assignment(assignment_id, **assignment)
+
+                else:
                     try:
-                        gb.find_assignment(assignment_id)
+                        assignment_row = gb.find_assignment(assignment_id)
                     except MissingEntry:
                         self.fail("No assignment called '%s' exists in the database", assignment_id)
 
-            # check if there are any extra notebooks in the db that are no longer
-            # part of the assignment, and if so, remove them
-            if self.coursedir.notebook_id == "*":
-                self._clean_old_notebooks(assignment_id, student_id)
+                # check if there are any extra notebooks in the db that are no longer
+                # part of the assignment, and if so, remove them
+                if self.coursedir.notebook_id == "*":
+                    self._clean_old_notebooks(gb, assignment_row, assignment_id, student_id)
@@ -1,8 +1,12 @@
+import datetime
+import io
 import os
 import shutil
 
+from ipython_genutils import text
+from nbconvert.exporters.export import exporter_map
 from textwrap import dedent
-from traitlets import List, Bool, observe
+from traitlets import List, Bool, Integer, observe
 
 from .baseapp import BaseNbConvertApp, nbconvert_aliases, nbconvert_flags
 from ..preprocessors import (
@@ -33,6 +37,27 @@ flags.update({
 })
 
 
+def _sanitize_and_execute(config, export_format, notebook_filename, resources,
+                          preprocessors):
+    """Sanitizes and then executes a single submitted notebook, returning the
+    resulting notebook as a string.
+
+    This is run in a worker process when `AutogradeApp.n_jobs` is greater
+    than one, so it creates its own exporter (and therefore its own kernel)
+    rather than using the one belonging to the app. Nothing is written to
+    the database or to disk here; that is left to the main process.
+
+    """
+    exporter = exporter_map[export_format](config=config)
+    exporter._preprocessors = []
+    for pp in preprocessors:
+        exporter.register_preprocessor(pp)
+
+    with io.open(notebook_filename, encoding='utf-8') as fh:
+        output, _ = exporter.from_file(fh, resources=resources)
+    return output
+
+
 class AutogradeApp(BaseNbConvertApp):
 
     name = u'nbgrader-autograde'
@@ -98,6 +123,59 @@ class AutogradeApp(BaseNbConvertApp):
         )
     ).tag(config=True)
 
+    n_jobs = Integer(
+        1,
+        help=dedent(
+            """
+            The number of notebooks to autograde in parallel. By default,
+            notebooks are autograded one at a time. If this is greater than 1,
+            notebooks are sanitized and executed in a pool of this many worker
+            processes (each running its own kernel), and the remaining autograde
+            preprocessors (starting from the one that saves grades to the
+            database) are then run in the main process.
+            """
+        )
+    ).tag(config=True)
+
+    reuse_kernels = Bool(
+        False,
+        help=dedent(
+            """
+            Whether to reuse the same kernel to execute each notebook (one
+            kernel per kernelspec), rather than starting a new kernel for every
+            notebook. The kernel's namespace is cleared with `%reset -f` (and
+            its execution counter is reset) in between notebooks, but other
+            state (such as modules that have already been imported) persists,
+            so only enable this if you are sure that the notebooks do not
+            interfere with each other. This only applies to IPython kernels,
+            requires nbconvert 5.4 or later, and is ignored when `n_jobs` is
+            greater than 1.
+            """
+        )
+    ).tag(config=True)
+
+    copy_threads = Integer(
+        8,
+        help=dedent(
+            """
+            The number of threads to use when copying files over from the
+            source directory.
+            """
+        )
+    ).tag(config=True)
+
+    separate_sanitize_pass = Bool(
+        False,
+        help=dedent(
+            """
+            Whether to write the sanitized notebook to the autograded directory
+            and read it back in before running the autograde preprocessors on
+            it, rather than running the sanitize and autograde preprocessors
+            one after the other on the same notebook in a single pass.
+            """
+        )
+    ).tag(config=True)
+
     _sanitizing = True
 
     @property
@@ -135,37 +213,32 @@ class AutogradeApp(BaseNbConvertApp):
 
         # try to get the student from the database, and throw an error if it
         # doesn't exist
-        student = {}
-        for s in self.db_students:
-            if s['id'] == student_id:
-                student = s.copy()
-                break
-
-        if student or self.create_student:
-            if 'id' in student:
-                del student['id']
-            self.log.info("Creating/updating student with ID '%s': %s", student_id, student)
-            with Gradebook(self.coursedir.db_url) as gb:
+        student = self._db_students_by_id.get(student_id, {}).copy()
+
+        # use a single connection to the database for all of the lookups and
+        # updates below, rather than reconnecting for each one
+        with Gradebook(self.coursedir.db_url) as gb:
+            if student or self.create_student:
+                if 'id' in student:
+                    del student['id']
+                self.log.info("Creating/updating student with ID '%s': %s", student_id, student)
                 gb.update_or_create_student(student_id, **student)
 
-        else:
-            with Gradebook(self.coursedir.db_url) as gb:
+            else:
                 try:
                     gb.find_student(student_id)
                 except MissingEntry:
                     self.fail("No student with ID '%s' exists in the database", student_id)
 
-        # make sure the assignment exists
-        with Gradebook(self.coursedir.db_url) as gb:
+            # make sure the assignment exists
             try:
-                gb.find_assignment(assignment_id)
+                assignment = gb.find_assignment(assignment_id)
             except MissingEntry:
                 self.fail("No assignment with ID '%s' exists in the database", assignment_id)
 
-        # try to read in a timestamp from file
-        src_path = self._format_source(assignment_id, student_id)
-        timestamp = self.coursedir.get_existing_timestamp(src_path)
-        with Gradebook(self.coursedir.db_url) as gb:
+            # try to read in a timestamp from file
+            src_path = self._format_source(assignment_id, student_id)
+            timestamp = self.coursedir.get_existing_timestamp(src_path)
             if timestamp:
                 submission = gb.update_or_create_submission(
                     assignment_id, student_id, timestamp=timestamp)
@@ -177,6 +250,8 @@ class AutogradeApp(BaseNbConvertApp):
             else:
                 submission = gb.update_or_create_submission(assignment_id, student_id)
 
+            known_notebook_ids = set(x.name for x in assignment.notebooks)
+
         # copy files over from the source directory
         self.log.info("Overwriting files with master versions from the source directory")
         dest_path = self._format_dest(assignment_id, student_id)
@@ -184,42 +259,140 @@ class AutogradeApp(BaseNbConvertApp):
         source_files = utils.find_all_files(source_path, self.coursedir.ignore + ["*.ipynb"])
 
         # copy them to the build directory
+        copies = []
         for filename in source_files:
             dest = os.path.join(dest_path, os.path.relpath(filename, source_path))
-            if not os.path.exists(os.path.dirname(dest)):
-                os.makedirs(os.path.dirname(dest))
-            if os.path.exists(dest):
-                os.remove(dest)
-            self.log.info("Copying %s -> %s", filename, dest)
-            shutil.copy(filename, dest)
+            copies.append((filename, dest))
+        self._copy_files(copies)
 
         # ignore notebooks that aren't in the database
         notebooks = []
-        with Gradebook(self.coursedir.db_url) as gb:
-            for notebook in self.notebooks:
-                notebook_id = os.path.splitext(os.path.basename(notebook))[0]
-                try:
-                    gb.find_notebook(notebook_id, assignment_id)
-                except MissingEntry:
-                    self.log.warning("Skipping unknown notebook: %s", notebook)
-                    continue
-                else:
-                    notebooks.append(notebook)
+        for notebook in self.notebooks:
+            notebook_id = os.path.splitext(os.path.basename(notebook))[0]
+            if notebook_id not in known_notebook_ids:
+                self.log.warning("Skipping unknown notebook: %s", notebook)
+                continue
+            notebooks.append(notebook)
         self.notebooks = notebooks
         if len(self.notebooks) == 0:
             self.fail("No notebooks found, did you forget to run 'nbgrader assign'?")
 
+    def _copy_file(self, filenames):
+        filename, dest = filenames
+        self.log.info("Copying %s -> %s", filename, dest)
+        # the mode is copied too, since the notebooks are executed (and may
+        # run helper scripts) before set_permissions is called
+        try:
+            shutil.copy(filename, dest)
+        except (IOError, OSError):
+            # copy overwrites an existing destination in place, which fails
+            # if it is read-only, so only then remove it and try again
+            if not os.path.exists(dest):
+                raise
+            utils.remove(dest)
+            shutil.copy(filename, dest)
+
+    def _copy_files(self, copies):
+        """Copies each (source, destination) pair in `copies`, using a pool
+        of threads when there is more than one file to copy."""
+        # create all of the destination directories up front, so the copies
+        # themselves don't have to check for them
+        for dirname in sorted(set(os.path.dirname(dest) for _, dest in copies)):
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+
+        if len(copies) <= 1:
+            for filenames in copies:
+                self._copy_file(filenames)
+            return
+
+        # multiprocessing is only imported when it is actually needed, since
+        # this module is loaded by every nbgrader command
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(self.copy_threads, len(copies)))
+        try:
+            pool.map(self._copy_file, copies)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _get_sanitize_preprocessors(self):
+        """Returns the sanitize preprocessors that actually need to be run.
+
+        When the notebooks are not going to be executed (e.g. with
+        `--no-execute`), neither clearing the output nor overwriting the
+        kernelspec (which requires a database lookup) has any effect on
+        grading, so those preprocessors are skipped.
+
+        """
+        preprocessors = list(self.sanitize_preprocessors)
+        if Execute(config=self.config).enabled or ClearOutput(config=self.config).enabled:
+            return preprocessors
+        return [pp for pp in preprocessors if pp not in (ClearOutput, OverwriteKernelspec)]
+
     def _init_preprocessors(self):
         self.exporter._preprocessors = []
-        if self._sanitizing:
-            preprocessors = self.sanitize_preprocessors
+        if not self.separate_sanitize_pass:
+            preprocessors = self._sanitize_preprocessors + list(self.autograde_preprocessors)
+        elif self._sanitizing:
+            preprocessors = self._sanitize_preprocessors
         else:
             preprocessors = self.autograde_preprocessors
 
         for pp in preprocessors:
             self.exporter.register_preprocessor(pp)
 
+        if self.reuse_kernels:
+            for pp in self.exporter._preprocessors:
+                if isinstance(pp, Execute):
+                    pp.persistent_kernels = self._persistent_kernels
+
+    def _init_execution_resources(self, notebook_filename, resources):
+        """Sets `resources['metadata']` for a submitted notebook that is
+        sanitized and executed in a single pass.
+
+        The notebook is read from the submitted directory, but it needs to
+        be executed from the autograded directory (where any other submitted
+        files and the source files have been copied to), just like it would
+        be if the sanitized notebook had been written there and read back in.
+
+        """
+        build_directory = self._format_dest(
+            resources['nbgrader']['assignment'], resources['nbgrader']['student'])
+        if not os.path.exists(build_directory):
+            os.makedirs(build_directory)
+        # the same metadata that Exporter.from_filename would set, apart
+        # from the path
+        modified_date = datetime.datetime.fromtimestamp(os.path.getmtime(notebook_filename))
+        resources['metadata'] = {
+            'name': os.path.splitext(os.path.basename(notebook_filename))[0],
+            'path': build_directory,
+            'modified_date': modified_date.strftime(text.date_format)
+        }
+        return resources
+
+    def export_single_notebook(self, notebook_filename, resources, input_buffer=None):
+        if self.separate_sanitize_pass:
+            return super(AutogradeApp, self).export_single_notebook(
+                notebook_filename, resources, input_buffer=input_buffer)
+
+        resources = self._init_execution_resources(notebook_filename, resources)
+        if input_buffer is not None:
+            return super(AutogradeApp, self).export_single_notebook(
+                notebook_filename, resources, input_buffer=input_buffer)
+
+        with io.open(notebook_filename, encoding='utf-8') as fh:
+            return super(AutogradeApp, self).export_single_notebook(
+                notebook_filename, resources, input_buffer=fh)
+
     def convert_single_notebook(self, notebook_filename):
+        if not self.separate_sanitize_pass:
+            self.log.info("Sanitizing and autograding %s", notebook_filename)
+            self._sanitizing = True
+            self._init_preprocessors()
+            super(AutogradeApp, self).convert_single_notebook(notebook_filename)
+            return
+
         self.log.info("Sanitizing %s", notebook_filename)
         self._sanitizing = True
         self._init_preprocessors()
@@ -233,3 +406,80 @@ class AutogradeApp(BaseNbConvertApp):
             super(AutogradeApp, self).convert_single_notebook(notebook_filename)
         finally:
             self._sanitizing = True
+
+    def _shutdown_persistent_kernels(self):
+        for kernel_name, km in self._persistent_kernels.items():
+            self.log.info("Shutting down persistent kernel: %s", kernel_name)
+            km.shutdown_kernel(now=True)
+        self._persistent_kernels.clear()
+
+    def convert_notebooks(self):
+        # which sanitize preprocessors are needed can't change during a run,
+        # so only work it out once rather than for every notebook
+        self._sanitize_preprocessors = self._get_sanitize_preprocessors()
+        self._persistent_kernels = {}
+        if self.reuse_kernels and not Execute.supports_persistent_kernels:
+            self.log.warning(
+                "Reusing kernels requires nbconvert 5.4 or later, so a new "
+                "kernel will be started for each notebook instead")
+        try:
+            super(AutogradeApp, self).convert_notebooks()
+        finally:
+            self._shutdown_persistent_kernels()
+
+    def _split_autograde_preprocessors(self):
+        """Splits the autograde preprocessors into those that can be run in a
+        worker process, and those (from `SaveAutoGrades` onwards) that need
+        to be run in the main process because they write to the database.
+
+        """
+        preprocessors = list(self.autograde_preprocessors)
+        if SaveAutoGrades in preprocessors:
+            index = preprocessors.index(SaveAutoGrades)
+        else:
+            index = len(preprocessors)
+        return preprocessors[:index], preprocessors[index:]
+
+    def convert_assignment_notebooks(self):
+        if self.n_jobs <= 1 or len(self.notebooks) <= 1:
+            super(AutogradeApp, self).convert_assignment_notebooks()
+            return
+
+        execute_preprocessors, save_preprocessors = self._split_autograde_preprocessors()
+
+        self.exporter = exporter_map[self.export_format](config=self.config)
+        self.exporter._preprocessors = []
+        for pp in save_preprocessors:
+            self.exporter.register_preprocessor(pp)
+
+        import multiprocessing
+        pool = multiprocessing.Pool(min(self.n_jobs, len(self.notebooks)))
+        try:
+            jobs = []
+            try:
+                for notebook_filename in self.notebooks:
+                    self.log.info("Sanitizing and executing %s", notebook_filename)
+                    resources = self._init_execution_resources(
+                        notebook_filename, self.init_single_notebook_resources(notebook_filename))
+                    job = pool.apply_async(_sanitize_and_execute, (
+                        self.config, self.export_format, notebook_filename, resources,
+                        self._sanitize_preprocessors + execute_preprocessors))
+                    jobs.append((notebook_filename, job))
+            finally:
+                pool.close()
+
+            # save the grades for each notebook, in order, as they finish
+            for notebook_filename, job in jobs:
+                self.log.info("Autograding %s", notebook_filename)
+                super(AutogradeApp, self).convert_single_notebook(
+                    notebook_filename, input_buffer=io.StringIO(job.get()))
+
+        except KeyboardInterrupt:
+            pool.terminate()
+            raise
+
+        finally:
+            # if autograding one of the notebooks failed, wait for the others
+            # to finish executing rather than terminating the workers, which
+            # would leave their kernels running
+            pool.join()
@@ -16,7 +16,7 @@ from nbconvert.exporters.export import exporter_map
 from nbconvert.nbconvertapp import NbConvertApp, DottedOrNone
 from textwrap import dedent
 from tornado.log import LogFormatter
-from traitlets import Unicode, List, Bool, Dict, Integer, Instance, default
+from traitlets import Unicode, List, Bool, Dict, Integer, Instance, default, observe
 from traitlets.config.application import catch_config_error
 from traitlets.config.loader import Config
 
@@ -141,6 +141,40 @@ class NbGrader(JupyterApp):
         )
     ).tag(config=True)
 
+    _db_assignments_lookup = None
+    _db_students_lookup = None
+
+    @observe("db_assignments")
+    def _db_assignments_changed(self, change):
+        self._db_assignments_lookup = None
+
+    @observe("db_students")
+    def _db_students_changed(self, change):
+        self._db_students_lookup = None
+
+    @property
+    def _db_assignments_by_name(self):
+        """A dictionary mapping assignment names to the entries in
+        `db_assignments`. If a name is listed more than once, the first
+        entry is used."""
+        if self._db_assignments_lookup is None:
+            lookup = {}
+            for a in self.db_assignments:
+                lookup.setdefault(a['name'], a)
+            self._db_assignments_lookup = lookup
+        return self._db_assignments_lookup
+
+    @property
+    def _db_students_by_id(self):
+        """A dictionary mapping student ids to the entries in `db_students`.
+        If an id is listed more than once, the first entry is used."""
+        if self._db_students_lookup is None:
+            lookup = {}
+            for s in self.db_students:
+                lookup.setdefault(s['id'], s)
+            self._db_students_lookup = lookup
+        return self._db_students_lookup
+
     coursedir = Instance(CourseDirectory, allow_none=True)
     verbose_crash = Bool(False)
 
@@ -525,6 +559,13 @@ class BaseNbConvertApp(NbGrader, NbConvertApp):
             for filename in filenames:
                 os.chmod(os.path.join(dirname, filename), permissions)
 
+    def convert_assignment_notebooks(self):
+        """Converts the notebooks (given by `self.notebooks`) of the
+        assignment that is currently being processed.
+
+        """
+        super(BaseNbConvertApp, self).convert_notebooks()
+
     def convert_notebooks(self):
         errors = []
 
@@ -562,7 +603,7 @@ class BaseNbConvertApp(NbGrader, NbConvertApp):
 
                 # initialize the destination and convert
                 self.init_assignment(gd['assignment_id'], gd['student_id'])
-                super(BaseNbConvertApp, self).convert_notebooks()
+                self.convert_assignment_notebooks()
                 self.set_permissions(gd['assignment_id'], gd['student_id'])
 
             except UnresponsiveKernelError:
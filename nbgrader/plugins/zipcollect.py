@@ -3,7 +3,7 @@ import re
 import shutil
 
 from textwrap import dedent
-from traitlets import Bool, List, Unicode
+from traitlets import Bool, List, Unicode, observe
 
 from .base import BasePlugin
 from ..utils import unzip
@@ -131,6 +131,12 @@ class FileNameCollectorPlugin(BasePlugin):
         )
     ).tag(config=True)
 
+    _named_regexp_compiled = None
+
+    @observe('named_regexp')
+    def _named_regexp_changed(self, change):
+        self._named_regexp_compiled = None
+
     def _match(self, filename):
         """Match the named group regular expression to the beginning of the
         filename and return the match groupdict or None if no match.
@@ -142,7 +148,11 @@ class FileNameCollectorPlugin(BasePlugin):
             )
             return None
 
-        match = re.match(self.named_regexp, filename)
+        # compile the regular expression once rather than for every file
+        if self._named_regexp_compiled is None:
+            self._named_regexp_compiled = re.compile(self.named_regexp)
+
+        match = self._named_regexp_compiled.match(filename)
         if not match or not match.groups():
             self.log.warn(
                 "Regular expression '{}' did not match anything in filename."
@@ -102,4 +102,10 @@ class ClearHiddenTests(NbGraderPreprocessor):
                     "'Autograder tests' cells."
                 )
 
+        # the source changed, so any checksum computed before this
+        # preprocessor ran is now stale -- refresh it here rather than
+        # rehashing every cell of the notebook again afterwards
+        if removed_test and 'checksum' in cell.metadata.get('nbgrader', {}):
+            cell.metadata.nbgrader['checksum'] = utils.compute_checksum(cell)
+
         return cell, resources
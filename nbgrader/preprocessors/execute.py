@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from nbconvert.preprocessors import ExecutePreprocessor
+from six.moves.queue import Empty
 from traitlets import Bool, List, Integer
 from textwrap import dedent
 
@@ -29,6 +31,87 @@ class Execute(NbGraderPreprocessor, ExecutePreprocessor):
         """)
     ).tag(config=True)
 
+    #: A dictionary mapping kernel names to kernel managers for kernels that
+    #: should be reused across notebooks, rather than starting a new kernel
+    #: for each one. This is set by the application that owns the kernels,
+    #: and is responsible for shutting them down. If this is None (the
+    #: default), a new kernel is used for every notebook. Reusing kernels
+    #: relies on nbconvert being able to execute a notebook with an existing
+    #: kernel manager, which requires nbconvert 5.4 or later (see
+    #: `supports_persistent_kernels`).
+    persistent_kernels = None
+
+    #: Whether this version of nbconvert can execute a notebook with a
+    #: kernel manager that is passed in, rather than starting its own kernel.
+    supports_persistent_kernels = hasattr(ExecutePreprocessor, 'setup_preprocessor')
+
+    def _reset_kernel(self, path):
+        """Clear the namespace of a reused kernel, restart its execution
+        counter, and change it into the directory of the notebook that is
+        about to be run."""
+        # %reset does not reset the execution counter, so do that by hand to
+        # keep the prompt numbers the same as they would be in a new kernel
+        code = "%reset -f\nget_ipython().execution_count = 1\n"
+        if path is not None:
+            code += "import os\nos.chdir({!r})\ndel os\n".format(path)
+
+        msg_id = self.kc.execute(code, silent=True, store_history=False)
+        while True:
+            try:
+                msg = self.kc.get_shell_msg(timeout=self.startup_timeout)
+            except Empty:
+                # treat this like any other unresponsive kernel, so that the
+                # notebook is retried (see preprocess)
+                raise RuntimeError("Timed out waiting for the kernel to reset")
+            if msg['parent_header'].get('msg_id') == msg_id:
+                break
+
+        if msg['content']['status'] != 'ok':
+            raise RuntimeError("Could not reset kernel: {}".format(msg['content']))
+
+    @contextmanager
+    def setup_preprocessor(self, nb, resources, km=None, **kwargs):
+        with super(Execute, self).setup_preprocessor(nb, resources, km=km, **kwargs) as context:
+            if km is None:
+                yield context
+                return
+
+            # nbconvert creates a new client for the kernel we passed in, but
+            # leaves it to us to close it again
+            kc = self.kc
+            try:
+                path = resources.get('metadata', {}).get('path', '') or None
+                self._reset_kernel(path)
+                yield context
+            finally:
+                kc.stop_channels()
+
+    def _shutdown_persistent_kernel(self, kernel_name):
+        km = self.persistent_kernels.pop(kernel_name)
+        km.shutdown_kernel(now=True)
+
+    def _preprocess_with_persistent_kernel(self, nb, resources, kernel_name):
+        if kernel_name not in self.persistent_kernels:
+            km = self.kernel_manager_class(kernel_name=kernel_name, config=self.config)
+
+            # the kernel is reset between notebooks with IPython magics, so
+            # only IPython kernels can be reused
+            if km.kernel_spec.language != 'python':
+                return super(Execute, self).preprocess(nb, resources)
+
+            self.log.info("Starting persistent kernel: %s", kernel_name)
+            path = resources.get('metadata', {}).get('path', '') or None
+            km.start_kernel(extra_arguments=self.extra_arguments, cwd=path)
+            self.persistent_kernels[kernel_name] = km
+
+        try:
+            return super(Execute, self).preprocess(
+                nb, resources, km=self.persistent_kernels[kernel_name])
+        except Exception:
+            # don't reuse a kernel that may be in a bad state
+            self._shutdown_persistent_kernel(kernel_name)
+            raise
+
     def preprocess(self, nb, resources, retries=None):
         kernel_name = nb.metadata.get('kernelspec', {}).get('name', 'python')
         if self.extra_arguments == [] and kernel_name == "python":
@@ -38,7 +121,12 @@ class Execute(NbGraderPreprocessor, ExecutePreprocessor):
             retries = self.execute_retries
 
         try:
-            output = super(Execute, self).preprocess(nb, resources)
+            if self.persistent_kernels is not None and self.supports_persistent_kernels:
+                if self.kernel_name:
+                    kernel_name = self.kernel_name
+                output = self._preprocess_with_persistent_kernel(nb, resources, kernel_name)
+            else:
+                output = super(Execute, self).preprocess(nb, resources)
         except RuntimeError:
             if retries == 0:
                 raise UnresponsiveKernelError()
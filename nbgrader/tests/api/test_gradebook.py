@@ -33,6 +33,27 @@ def test_init(gradebook):
     assert gradebook.assignments == []
 
 
+def test_shared_engine(tmpdir):
+    db_url = "sqlite:///" + str(tmpdir.join("gradebook.db"))
+    with api.Gradebook(db_url) as gb1:
+        gb1.add_student('12345')
+        engine = gb1.engine
+
+    with api.Gradebook(db_url) as gb2:
+        assert gb2.engine is engine
+        assert [s.id for s in gb2.students] == ['12345']
+
+
+def test_unshared_memory_engine():
+    with api.Gradebook("sqlite:///:memory:") as gb1:
+        gb1.add_student('12345')
+        engine = gb1.engine
+
+    with api.Gradebook("sqlite:///:memory:") as gb2:
+        assert gb2.engine is not engine
+        assert gb2.students == []
+
+
 #### Test students
 
 def test_add_student(gradebook):
@@ -5,17 +5,30 @@ import pytest
 
 from os.path import join
 from textwrap import dedent
-from nbformat import current_nbformat
+from nbformat import current_nbformat, writes
+from nbformat.v4 import new_notebook, new_code_cell
 
 from ...api import Gradebook
+from ...preprocessors import Execute
 from ...utils import remove
 from ...nbformat import reads
 from .. import run_nbgrader
 from .base import BaseTestApp
+from .conftest import notwindows
 
 
 class TestNbGraderAutograde(BaseTestApp):
 
+    def _make_code_notebook(self, path, source):
+        nb = new_notebook()
+        nb.metadata.kernelspec = {
+            "display_name": "Python",
+            "language": "python",
+            "name": "python"
+        }
+        nb.cells.append(new_code_cell(source=source))
+        self._make_file(path, writes(nb))
+
     def test_help(self):
         """Does the help display without error?"""
         run_nbgrader(["autograde", "--help-all"])
@@ -397,6 +410,30 @@ class TestNbGraderAutograde(BaseTestApp):
             contents = fh.read()
         assert contents == "some,data\n"
 
+    @notwindows
+    def test_source_file_mode(self, db, course_dir):
+        """Do source files keep their mode while the notebooks are executed?"""
+        with open("nbgrader_config.py", "a") as fh:
+            fh.write("""c.NbGrader.db_assignments = [dict(name='ps1', duedate='2015-02-02 14:58:23.948203 PST')]\n""")
+            fh.write("""c.NbGrader.db_students = [dict(id="foo"), dict(id="bar")]""")
+
+        source = dedent(
+            """
+            import os
+            with open("executable.txt", "w") as fh:
+                fh.write(str(os.access("run.sh", os.X_OK)))
+            """
+        ).strip()
+        self._make_code_notebook(join(course_dir, "source", "ps1", "p1.ipynb"), source)
+        self._make_file(join(course_dir, "source", "ps1", "run.sh"), "#!/bin/sh\n")
+        os.chmod(join(course_dir, "source", "ps1", "run.sh"), 0o755)
+        run_nbgrader(["assign", "ps1", "--db", db])
+
+        self._make_code_notebook(join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"), source)
+        run_nbgrader(["autograde", "ps1", "--db", db])
+
+        assert self._file_contents(join(course_dir, "autograded", "foo", "ps1", "executable.txt")) == "True"
+
     def test_side_effects(self, db, course_dir):
         with open("nbgrader_config.py", "a") as fh:
             fh.write("""c.NbGrader.db_assignments = [dict(name='ps1', duedate='2015-02-02 14:58:23.948203 PST')]\n""")
@@ -411,6 +448,75 @@ class TestNbGraderAutograde(BaseTestApp):
         assert os.path.isfile(join(course_dir, "autograded", "foo", "ps1", "side-effect.txt"))
         assert not os.path.isfile(join(course_dir, "submitted", "foo", "ps1", "side-effect.txt"))
 
+    @pytest.mark.parametrize("option", [
+        "n_jobs = 2",
+        "reuse_kernels = True",
+        "separate_sanitize_pass = True"
+    ])
+    def test_grade_options(self, db, course_dir, option):
+        """Are notebooks graded the same way with each of the autograde options?"""
+        with open("nbgrader_config.py", "a") as fh:
+            fh.write("""c.NbGrader.db_assignments = [dict(name='ps1', duedate='2015-02-02 14:58:23.948203 PST')]\n""")
+            fh.write("""c.NbGrader.db_students = [dict(id="foo"), dict(id="bar")]\n""")
+            fh.write("""c.AutogradeApp.{}""".format(option))
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "side-effects.ipynb"), join(course_dir, "source", "ps1", "p2.ipynb"))
+        run_nbgrader(["assign", "ps1", "--db", db])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "side-effects.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p2.ipynb"))
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "side-effects.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p2.ipynb"))
+        run_nbgrader(["autograde", "ps1", "--db", db])
+
+        for student in ["foo", "bar"]:
+            assert os.path.isfile(join(course_dir, "autograded", student, "ps1", "p1.ipynb"))
+            assert os.path.isfile(join(course_dir, "autograded", student, "ps1", "p2.ipynb"))
+            assert os.path.isfile(join(course_dir, "autograded", student, "ps1", "side-effect.txt"))
+            assert not os.path.isfile(join(course_dir, "submitted", student, "ps1", "side-effect.txt"))
+
+        with Gradebook(db) as gb:
+            notebook = gb.find_submission_notebook("p1", "ps1", "foo")
+            assert notebook.score == 1
+            assert notebook.max_score == 7
+            assert notebook.needs_manual_grade == False
+
+            notebook = gb.find_submission_notebook("p1", "ps1", "bar")
+            assert notebook.score == 2
+            assert notebook.max_score == 7
+            assert notebook.needs_manual_grade == True
+
+    @pytest.mark.skipif(
+        not Execute.supports_persistent_kernels,
+        reason="Reusing kernels requires nbconvert 5.4 or later")
+    def test_reuse_kernels_reset(self, db, course_dir):
+        """Is the namespace of a reused kernel cleared between notebooks?"""
+        with open("nbgrader_config.py", "a") as fh:
+            fh.write("""c.NbGrader.db_assignments = [dict(name='ps1', duedate='2015-02-02 14:58:23.948203 PST')]\n""")
+            fh.write("""c.NbGrader.db_students = [dict(id="foo"), dict(id="bar")]\n""")
+            fh.write("""c.AutogradeApp.reuse_kernels = True""")
+
+        # p1 defines a name that p2 uses, which shouldn't be possible if the
+        # kernel's namespace is cleared in between them
+        self._make_code_notebook(join(course_dir, "source", "ps1", "p1.ipynb"), "x = 1")
+        self._make_code_notebook(join(course_dir, "source", "ps1", "p2.ipynb"), "print(x)")
+        run_nbgrader(["assign", "ps1", "--db", db])
+
+        for student in ["foo", "bar"]:
+            self._make_code_notebook(join(course_dir, "submitted", student, "ps1", "p1.ipynb"), "x = 1")
+            self._make_code_notebook(join(course_dir, "submitted", student, "ps1", "p2.ipynb"), "print(x)")
+        run_nbgrader(["autograde", "ps1", "--db", db])
+
+        for student in ["foo", "bar"]:
+            with open(join(course_dir, "autograded", student, "ps1", "p2.ipynb"), "r") as fh:
+                nb = reads(fh.read(), as_version=current_nbformat)
+            cell = nb.cells[0]
+            assert cell.execution_count == 1
+            assert len(cell.outputs) == 1
+            assert cell.outputs[0].output_type == "error"
+            assert cell.outputs[0].ename == "NameError"
+
     def test_skip_extra_notebooks(self, db, course_dir):
         with open("nbgrader_config.py", "a") as fh:
             fh.write("""c.NbGrader.db_assignments = [dict(name='ps1', duedate='2015-02-02 14:58:23.948203 PST')]\n""")
@@ -703,6 +809,22 @@ class TestNbGraderAutograde(BaseTestApp):
             else:
                 assert 'outputs' not in new_cell
 
+    def test_no_execute_keeps_kernelspec(self, course_dir):
+        with open("nbgrader_config.py", "a") as fh:
+            fh.write("""c.NbGrader.db_assignments = [dict(name='ps1', duedate='2015-02-02 14:58:23.948203 PST')]\n""")
+            fh.write("""c.NbGrader.db_students = [dict(id="foo")]""")
+
+        self._empty_notebook(join(course_dir, "source", "ps1", "p1.ipynb"), kernel="python")
+        run_nbgrader(["assign", "ps1"])
+
+        self._empty_notebook(join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"), kernel="blah")
+        run_nbgrader(["autograde", "ps1", "--no-execute"])
+
+        # the kernelspec is only overwritten when the notebook is executed
+        with open(join(course_dir, "autograded", "foo", "ps1", "p1.ipynb"), "r") as fh:
+            nb = reads(fh.read(), as_version=current_nbformat)
+        assert nb.metadata.kernelspec.name == "blah"
+
     def test_many_students(self, course_dir):
         pytest.skip("this test takes too long to run and requires manual configuration")
 
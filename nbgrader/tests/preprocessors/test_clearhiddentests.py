@@ -5,7 +5,8 @@ from textwrap import dedent
 from traitlets.config import Config
 
 from .base import BaseTestPreprocessor
-from .. import create_code_cell, create_text_cell
+from .. import create_code_cell, create_text_cell, create_grade_cell
+from ...utils import compute_checksum
 from ...preprocessors import ClearHiddenTests
 
 
@@ -108,6 +109,27 @@ class TestClearHiddenTests(BaseTestPreprocessor):
         assert cell.source == "assert True"
         assert cell.metadata.nbgrader['grade']
 
+    def test_preprocess_code_grade_cell_hidden_test_region_checksum(self, preprocessor):
+        """Is the checksum of a grade cell updated when a hidden test region is removed?"""
+        source = dedent(
+            """
+            assert True
+            ### BEGIN HIDDEN TESTS
+            assert True
+            ### END HIDDEN TESTS
+            """
+        ).strip()
+        cell = create_grade_cell(source, "code", "foo", 1)
+        cell.metadata.nbgrader['checksum'] = compute_checksum(cell)
+        old_checksum = cell.metadata.nbgrader['checksum']
+
+        resources = dict()
+        cell = preprocessor.preprocess_cell(cell, resources, 1)[0]
+
+        assert cell.source == "assert True"
+        assert cell.metadata.nbgrader['checksum'] != old_checksum
+        assert cell.metadata.nbgrader['checksum'] == compute_checksum(cell)
+
     def test_preprocess_text_grade_cell_hidden_test_region(self, preprocessor):
         """Is a text grade cell correctly cleared when there is a hidden test region?"""
         cell = create_text_cell()
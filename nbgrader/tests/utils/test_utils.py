@@ -2,6 +2,8 @@ import os
 import pytest
 import tempfile
 import shutil
+import stat
+import sys
 import zipfile
 
 from nbformat.v4 import new_output
@@ -339,3 +341,29 @@ def test_unzip_tree(temp_cwd):
     assert os.path.isdir(os.path.join("data", "bar"))
     assert os.path.isdir(os.path.join("data", "baz", "bar"))
     assert os.path.isfile(os.path.join("data", "baz", "bar", "foo.txt"))
+
+
+def test_unzip_unsafe_paths(temp_cwd):
+    with open(join("foo.txt"), "w") as fh:
+        fh.write("foo")
+    with zipfile.ZipFile("baz.zip", "w") as fh:
+        fh.write("foo.txt")
+        fh.write("foo.txt", "../bar.txt")
+
+    os.mkdir("out")
+    utils.unzip("baz.zip", os.path.join(os.getcwd(), "out"))
+    assert os.listdir("out") == ["foo.txt"]
+    assert not os.path.exists("bar.txt")
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="unix file modes are not supported on Windows")
+def test_unzip_executable(temp_cwd):
+    with open(join("run.sh"), "w") as fh:
+        fh.write("#!/bin/sh\n")
+    os.chmod("run.sh", 0o755)
+    with zipfile.ZipFile("baz.zip", "w") as fh:
+        fh.write("run.sh")
+
+    os.mkdir("out")
+    utils.unzip("baz.zip", os.path.join(os.getcwd(), "out"))
+    assert stat.S_IMODE(os.stat(join("out", "run.sh")).st_mode) == 0o755
@@ -80,7 +80,7 @@ setup_args = dict(
         'console_scripts': ['nbgrader=nbgrader.apps.nbgraderapp:main']
     },
     install_requires=[
-        "sqlalchemy",
+        "sqlalchemy>=1.2",
         "python-dateutil",
         "jupyter",
         "notebook>=4.2",